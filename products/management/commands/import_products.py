@@ -1,11 +1,119 @@
 import csv
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from operator import itemgetter
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
 
 from products.models import Product
 
+# Default number of rows sent to the database per INSERT/UPDATE statement
+BATCH_SIZE = 1000
+
+# Slug prefixes OR-ed into one query; SQLite rejects expression trees deeper than 1000
+SLUG_LOOKUP_CHUNK = 250
+
+# Read the CSV in 1 MiB chunks instead of the default 8 KiB to cut read() calls on large files
+READ_BUFFER_SIZE = 1 << 20
+
+# Product fields the import writes on --update
+UPDATE_FIELDS = [
+    "description", "price", "country_of_origin", "province", "variety", "winery", "image_url", "stock",
+]
+
+ZERO_PRICE = Decimal("0.00")
+
+
+@lru_cache(maxsize=4096)
+def parse_price(price_raw):
+    """Parse a price string into a Decimal; raises InvalidOperation if it is not a number.
+
+    Wine prices repeat a lot across a CSV, so parsed values are memoized (Decimal is immutable).
+    """
+    return Decimal(price_raw)
+
+
+# CSV columns read by parse_row(), in the order it unpacks them; image_url/image/stock are optional
+FIELDS = ("title", "winery", "price", "description", "country", "province", "variety", "image_url", "image", "stock")
+
+
+def parse_row(cells):
+    """Normalize one CSV row into (title, winery, defaults, warnings).
+
+    cells holds the already stripped values of FIELDS, in order ("" for absent columns).
+    defaults is None when the row has to be skipped.
+    """
+    title, winery, price_raw, description, country, province, variety, image_url, image, stock_raw = cells
+    warnings = []
+
+    # Required fields
+    if not title or not winery:
+        warnings.append("missing title or winery → skipped")
+        return title, winery, None, warnings
+
+    # Parse price into Decimal (safe for DecimalField)
+    try:
+        price = parse_price(price_raw) if price_raw != "" else ZERO_PRICE
+    except InvalidOperation:
+        warnings.append(f"invalid price '{price_raw}' → set to 0.00")
+        price = ZERO_PRICE
+
+    # Prepare defaults dict for product creation/update;
+    # image_url may be named 'image_url' or 'image' in CSV and defaults to empty string
+    defaults = {
+        "description": description,
+        "price": price,
+        "country_of_origin": country,
+        "province": province,
+        "variety": variety,
+        "winery": winery,
+        "image_url": image_url or image,
+    }
+
+    # If CSV contains stock, try to parse it; otherwise leave out so model default (200) applies
+    if stock_raw:
+        try:
+            defaults["stock"] = int(stock_raw)
+        except ValueError:
+            warnings.append(f"invalid stock '{stock_raw}' → using model default")
+
+    return title, winery, defaults, warnings
+
+
+def existing_slugs(bases):
+    """Return the stored slugs that unique_slug() could generate for bases: the base itself or any base-N.
+
+    Every base is checked, not only the ones already stored: a title such as "Cuvee 2" stores
+    "cuvee-2" without "cuvee" ever existing. The base-N family is matched as the range
+    ("base-", "base.") ("." sorts right after "-"), which the unique slug index can serve, unlike
+    LIKE 'base%'. Lookups are OR-ed SLUG_LOOKUP_CHUNK bases at a time to stay under SQLite's
+    expression depth limit.
+    """
+    bases = list(bases)
+    taken = set()
+    for start in range(0, len(bases), SLUG_LOOKUP_CHUNK):
+        chunk = bases[start:start + SLUG_LOOKUP_CHUNK]
+        lookup = Q(slug__in=chunk)
+        for base in chunk:
+            lookup |= Q(slug__gt=f"{base}-", slug__lt=f"{base}.")
+        taken.update(Product.objects.filter(lookup).values_list("slug", flat=True))
+    return taken
+
+
+def unique_slug(title, taken):
+    """Slugify title, appending -2, -3, ... until it is not in taken, and record the result in taken."""
+    base = slugify(title)
+    slug = base
+    suffix = 2
+    while slug in taken:
+        slug = f"{base}-{suffix}"
+        suffix += 1
+    taken.add(slug)
+    return slug
+
 
 class Command(BaseCommand):
     help = (
@@ -24,109 +132,166 @@ class Command(BaseCommand):
             action="store_true",
             help="If provided, update existing products (matched by title+winery)",
         )
+        # Optional batch size for the bulk INSERT/UPDATE statements
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Rows written per INSERT/UPDATE statement (default {BATCH_SIZE})",
+        )
 
     def handle(self, *args, **options):
         csv_file = options["csv_file"]
         update_existing = options["update"]
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer")
 
         # Try opening the CSV; raise a clean error if not found
         try:
-            f = open(csv_file, newline="", encoding="utf-8")
+            f = open(csv_file, newline="", encoding="utf-8", buffering=READ_BUFFER_SIZE)
         except FileNotFoundError:
             raise CommandError(f"CSV file not found: {csv_file}")
 
-        reader = csv.DictReader(f)
+        # Plain csv.reader avoids building a dict per row; cells are looked up by header position
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = {name: index for index, name in enumerate(header)}
+        # Pick FIELDS out of each row in one C-level call; absent columns point just past the
+        # header width, where every row gets an empty padding cell
+        width = len(header)
+        pick = itemgetter(*(columns.get(name, width) for name in FIELDS))
+        padding = [""] * (width + 1)
 
         # Ensure required columns are present
         required = ["country", "description", "price", "province", "title", "variety", "winery"]
-        missing = [c for c in required if c not in (reader.fieldnames or [])]
+        missing = [c for c in required if c not in columns]
         if missing:
             f.close()
             raise CommandError(f"CSV is missing required columns: {', '.join(missing)}")
 
+        # Per-row messages are buffered and written in one go; row-by-row progress only with -v 2,
+        # warnings/errors are not even formatted with -v 0. Progress is kept as (row, message) pairs
+        # so the parse and DB phases can be merged back into row order.
+        verbosity = options["verbosity"]
+        verbose = verbosity >= 2
+        report_problems = verbosity >= 1
+        details = []
+        problems = []
+        row_errors = []
+        add_detail = details.append
+        add_problem = problems.append
+        add_error = row_errors.append
+
         created = 0
         updated = 0
         skipped = 0
         errors = 0
 
-        # Iterate rows with an index for helpful messages
+        # Parse every row up front, keyed by title + winery; DB work happens in batches below
+        rows = {}
         for i, row in enumerate(reader, start=1):
-            # Keep each row inside a transaction so partial failures don't corrupt DB
-            with transaction.atomic():
-                try:
-                    # Read and normalize required fields
-                    title = (row.get("title") or "").strip()
-                    winery = (row.get("winery") or "").strip()
-                    if not title or not winery:
-                        self.stdout.write(self.style.WARNING(f"Row {i}: missing title or winery → skipped"))
-                        skipped += 1
+            # Blank lines come through as empty lists (DictReader used to drop them)
+            if not row:
+                continue
+            try:
+                # Trim to the header width (short rows are padded), then strip the picked cells once
+                del row[width:]
+                row += padding[len(row):]
+                title, winery, defaults, warnings = parse_row([cell.strip() for cell in pick(row)])
+                if warnings and report_problems:
+                    for warning in warnings:
+                        add_problem(f"Row {i}: {warning}")
+                if defaults is None:
+                    skipped += 1
+                    continue
+
+                # The same product may appear more than once in the CSV; later rows only win with --update
+                key = (title, winery)
+                if key in rows:
+                    skipped += 1
+                    if not update_existing:
+                        if verbose:
+                            add_detail((i, f"Row {i}: {title} already exists → skipped (use --update to overwrite)"))
                         continue
+                    if verbose:
+                        add_detail((rows[key][0], f"Row {rows[key][0]}: {title} overridden by row {i} → skipped"))
+                rows[key] = (i, defaults)
+
+            except Exception as exc:
+                errors += 1
+                if report_problems:
+                    add_error(f"Row {i}: Error importing row → {exc}")
 
-                    # Parse price into Decimal (safe for DecimalField)
-                    price_raw = (row.get("price") or "").strip()
-                    try:
-                        price = Decimal(price_raw) if price_raw != "" else Decimal("0.00")
-                    except InvalidOperation:
-                        self.stdout.write(self.style.WARNING(f"Row {i}: invalid price '{price_raw}' → set to 0.00"))
-                        price = Decimal("0.00")
-
-                    # Prepare defaults dict for product creation/update
-                    defaults = {
-                        "description": (row.get("description") or "").strip(),
-                        "price": price,
-                        "country_of_origin": (row.get("country") or "").strip(),
-                        "province": (row.get("province") or "").strip(),
-                        "variety": (row.get("variety") or "").strip(),
-                        "winery": winery,
-                    }
-
-                    # image_url may be named 'image_url' or 'image' in CSV; default to empty string
-                    image_url = row.get("image_url") or row.get("image") or ""
-                    defaults["image_url"] = image_url.strip() if image_url else ""
-
-                    # If CSV contains stock, try to parse it; otherwise leave out so model default (200) applies
-                    stock_raw = row.get("stock")
-                    if stock_raw:
-                        try:
-                            defaults["stock"] = int(stock_raw)
-                        except ValueError:
-                            self.stdout.write(self.style.WARNING(f"Row {i}: invalid stock '{stock_raw}' → using model default"))
-
-                    # Try to find existing product by title + winery
-                    product_qs = Product.objects.filter(title=title, winery=winery)
-                    product = product_qs.first()
-
-                    if product:
+        f.close()
+
+        # Written before the DB phase so they are not lost if the import is rolled back
+        if problems:
+            self.stdout.write(self.style.WARNING("\n".join(problems)))
+        if row_errors:
+            self.stdout.write(self.style.ERROR("\n".join(row_errors)))
+
+        # One transaction for the whole import; a failing batch rolls back everything
+        try:
+            with transaction.atomic():
+                # Fetch candidate products in a single query as plain tuples (no model instances) and
+                # match on title + winery in Python
+                titles = {title for title, _ in rows}
+                candidates = Product.objects.filter(title__in=titles).values_list(
+                    "pk", "title", *UPDATE_FIELDS
+                )
+                winery_at = UPDATE_FIELDS.index("winery")
+                existing = {
+                    (title, current[winery_at]): (pk, current)
+                    for pk, title, *current in candidates
+                }
+
+                to_create = []
+                to_update = []
+                for (title, winery), (i, defaults) in rows.items():
+                    match = existing.get((title, winery))
+
+                    if match:
                         if update_existing:
-                            # Update only if values changed (minimize writes)
-                            changed = False
-                            for field, val in defaults.items():
-                                current = getattr(product, field, None)
-                                # For decimals and ints the direct comparison works; for strings guard against None
-                                if (current is None and val) or (current != val):
-                                    setattr(product, field, val)
-                                    changed = True
-                            if changed:
-                                product.save()
+                            # Update only if values changed (minimize writes); fields missing from the CSV
+                            # (stock) keep their stored value, so compare the merged dict with the stored one
+                            pk, current = match
+                            stored = dict(zip(UPDATE_FIELDS, current))
+                            values = {**stored, **defaults}
+                            if values != stored:
+                                to_update.append(Product(pk=pk, title=title, **values))
                                 updated += 1
-                                self.stdout.write(self.style.SUCCESS(f"Row {i}: Updated {product.title}"))
+                                if verbose:
+                                    add_detail((i, f"Row {i}: Updated {title}"))
                             else:
                                 skipped += 1
-                                self.stdout.write(f"Row {i}: No changes for {product.title} → skipped")
+                                if verbose:
+                                    add_detail((i, f"Row {i}: No changes for {title} → skipped"))
                         else:
                             skipped += 1
-                            self.stdout.write(f"Row {i}: {product.title} already exists → skipped (use --update to overwrite)")
+                            if verbose:
+                                add_detail((i, f"Row {i}: {title} already exists → skipped (use --update to overwrite)"))
                     else:
-                        # Create new product with defaults; stock will default to model default if not in defaults
-                        product = Product.objects.create(title=title, **defaults)
+                        to_create.append(Product(title=title, **defaults))
                         created += 1
-                        self.stdout.write(self.style.SUCCESS(f"Row {i}: Created {product.title}"))
+                        if verbose:
+                            add_detail((i, f"Row {i}: Created {title}"))
 
-                except Exception as exc:
-                    errors += 1
-                    self.stdout.write(self.style.ERROR(f"Row {i}: Error importing row → {exc}"))
+                # bulk_create bypasses Product.save(), so slugs are assigned here, avoiding the ones
+                # already in the database as well as those handed out earlier in this import
+                taken_slugs = existing_slugs({slugify(product.title) for product in to_create})
+                for product in to_create:
+                    product.slug = unique_slug(product.title, taken_slugs)
 
-        f.close()
+                Product.objects.bulk_create(to_create, batch_size=batch_size)
+                if to_update:
+                    Product.objects.bulk_update(to_update, fields=UPDATE_FIELDS, batch_size=batch_size)
+        except IntegrityError as exc:
+            raise CommandError(f"Import rolled back, nothing was written: {exc}")
+
+        if details:
+            details.sort(key=itemgetter(0))
+            self.stdout.write("\n".join(message for _, message in details))
 
         # Summary
         self.stdout.write(self.style.SUCCESS(
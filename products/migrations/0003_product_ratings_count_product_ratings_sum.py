@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:17
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    totals = Product.objects.annotate(
+        stars_sum=Sum('user_ratings__stars'),
+        stars_count=Count('user_ratings'),
+    ).filter(stars_count__gt=0)
+    for product in totals:
+        product.ratings_sum = product.stars_sum
+        product.ratings_count = product.stars_count
+        product.ratings = product.stars_sum / product.stars_count
+        product.save(update_fields=['ratings_sum', 'ratings_count', 'ratings'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_product_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='ratings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='ratings_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_ratings_count_product_ratings_sum'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['title', 'winery'], name='products_pr_title_af604b_idx'),
+        ),
+    ]
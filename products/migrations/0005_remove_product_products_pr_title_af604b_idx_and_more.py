@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:18
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def check_no_duplicate_products(apps, schema_editor):
+    # Fail with a readable message instead of a bare IntegrityError; duplicates (e.g. created through
+    # the admin) must be merged or removed by hand, deleting them here would also drop their ratings
+    Product = apps.get_model('products', 'Product')
+    duplicates = (
+        Product.objects.values('title', 'winery')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('title', 'winery')
+    )
+    if duplicates:
+        listed = '\n'.join(f"  {d['title']!r} / {d['winery']!r} ({d['count']} rows)" for d in duplicates[:20])
+        raise RuntimeError(
+            'Cannot make (title, winery) unique on Product, these pairs have more than one row:\n'
+            f'{listed}\nMerge or delete the duplicates, then run migrate again.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_products_pr_title_af604b_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_products, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_title_af604b_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='product',
+            unique_together={('title', 'winery')},
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.text import slugify
-from django.db.models import Avg
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
 
 
 # Create your models here.
@@ -17,19 +18,35 @@ class Product(models.Model):
     image_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     ratings = models.FloatField(default=0.0)
+    ratings_sum = models.PositiveIntegerField(default=0)
+    ratings_count = models.PositiveIntegerField(default=0)
     slug = models.SlugField(unique=True, max_length=200)
 
+    class Meta:
+        # A product is identified by title + winery (see the import_products command)
+        unique_together = ('title', 'winery')
+
     def __str__(self):
         return self.title
     
-    def update_average_rating(self):
-        """Recalculate and update the average rating."""
-        avg_rating = self.user_ratings.aggregate(avg=Avg("stars"))["avg"]
-        self.ratings = avg_rating if avg_rating is not None else 0.0
-        self.save(update_fields=["ratings"])
+    @classmethod
+    def update_average_rating(cls, product_id, stars_delta, count_delta):
+        """Apply a rating change to a product's running totals and average in a single UPDATE.
+
+        Takes the product id so callers never need to load the product itself.
+        """
+        new_sum = F("ratings_sum") + stars_delta
+        new_count = F("ratings_count") + count_delta
+        cls.objects.filter(pk=product_id).update(
+            ratings_sum=new_sum,
+            ratings_count=new_count,
+            # Dividing by NULL instead of 0 yields NULL, so the last deleted rating resets the average to 0
+            ratings=Coalesce(Cast(new_sum, FloatField()) / NullIf(new_count, 0), Value(0.0)),
+        )
 
     def save(self, *args, **kwargs):
-        if not self.slug:
+        # Only new products get a slug generated; updates keep the stored one
+        if self._state.adding and not self.slug:
             self.slug = slugify(self.title)
         super(Product, self).save(*args, **kwargs)
 
@@ -44,9 +61,29 @@ class Rating(models.Model):
         unique_together = ('user', 'product')
 
     def save(self, *args, **kwargs):
-        super(Rating, self).save(*args, **kwargs)
-        # Update product average rating whenever a rating is created/updated
-        self.product.update_average_rating()
+        # One transaction, so the page cache (cleared on commit) never sees the rating without its totals
+        with transaction.atomic():
+            # Lock and read the stored rating so an edit only shifts the totals by the difference
+            previous = None
+            if not self._state.adding:
+                previous = (
+                    Rating.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("product_id", "stars")
+                    .first()
+                )
+            super(Rating, self).save(*args, **kwargs)
+            # Update product average rating whenever a rating is created/updated
+            if previous is None:
+                Product.update_average_rating(self.product_id, self.stars, 1)
+                return
+            old_product_id, old_stars = previous
+            if old_product_id != self.product_id:
+                # Rating moved to another product (editable in the admin)
+                Product.update_average_rating(old_product_id, -old_stars, -1)
+                Product.update_average_rating(self.product_id, self.stars, 1)
+            elif old_stars != self.stars:
+                Product.update_average_rating(self.product_id, self.stars - old_stars, 0)
 
     def __str__(self):
         return f"{self.user.username} - {self.product.title} ({self.stars}⭐)"
\ No newline at end of file
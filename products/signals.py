@@ -0,0 +1,26 @@
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product, Rating
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Rating)
+def clear_page_cache(sender, **kwargs):
+    """Drop cached product pages (see home_view) whenever a product or rating changes.
+
+    Signals fire before Rating.save() / the delete receiver below update the product totals, so the
+    cache is only cleared once the surrounding transaction commits.
+    """
+    transaction.on_commit(caches["pages"].clear)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_totals(sender, instance, origin=None, **kwargs):
+    """Take a deleted rating out of its product's totals (also runs for queryset and cascade deletes)."""
+    # Ratings cascading from a product delete: that product's totals are about to go as well
+    if isinstance(origin, Product) or getattr(origin, "model", None) is Product:
+        return
+    Product.update_average_rating(instance.product_id, -instance.stars, -1)
@@ -1,3 +1,166 @@
+import csv
+import os
+import re
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
 
+from .models import Product, Rating
+
 # Create your tests here.
+HEADER = ["title", "winery", "price", "country", "description", "province", "variety"]
+
+
+def make_product(title, winery="Winery", **kwargs):
+    fields = {
+        "description": "d",
+        "price": Decimal("10.00"),
+        "country_of_origin": "Slovenia",
+        "province": "Goriska Brda",
+        "variety": "Rebula",
+    }
+    fields.update(kwargs)
+    return Product.objects.create(title=title, winery=winery, **fields)
+
+
+class ImportProductsTests(TestCase):
+    def run_import(self, rows, *args, header=HEADER):
+        """Write rows to a temporary CSV, run import_products on it and return the summary counts."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8", delete=False) as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        self.addCleanup(os.remove, f.name)
+
+        out = StringIO()
+        call_command("import_products", f.name, *args, stdout=out)
+        summary = re.search(r"created=(\d+) updated=(\d+) skipped=(\d+) errors=(\d+)", out.getvalue())
+        return dict(zip(("created", "updated", "skipped", "errors"), map(int, summary.groups())))
+
+    def row(self, title, winery="Winery", price="10.0"):
+        return [title, winery, price, "Slovenia", "d", "Goriska Brda", "Rebula"]
+
+    def test_creates_then_skips_existing(self):
+        counts = self.run_import([self.row("Red"), self.row("White")])
+        self.assertEqual(counts, {"created": 2, "updated": 0, "skipped": 0, "errors": 0})
+        self.assertEqual(Product.objects.get(title="Red").slug, "red")
+
+        counts = self.run_import([self.row("Red"), self.row("White")])
+        self.assertEqual(counts, {"created": 0, "updated": 0, "skipped": 2, "errors": 0})
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_update_only_writes_changed_rows(self):
+        self.run_import([self.row("Red"), self.row("White")])
+
+        counts = self.run_import([self.row("Red", price="12.5"), self.row("White")], "--update")
+        self.assertEqual(counts, {"created": 0, "updated": 1, "skipped": 1, "errors": 0})
+        self.assertEqual(Product.objects.get(title="Red").price, Decimal("12.50"))
+
+    def test_duplicate_rows_without_update_keep_first(self):
+        counts = self.run_import([self.row("Red", price="10.0"), self.row("Red", price="20.0")])
+        self.assertEqual(counts, {"created": 1, "updated": 0, "skipped": 1, "errors": 0})
+        self.assertEqual(Product.objects.get(title="Red").price, Decimal("10.00"))
+
+    def test_duplicate_rows_with_update_keep_last(self):
+        counts = self.run_import([self.row("Red", price="10.0"), self.row("Red", price="20.0")], "--update")
+        self.assertEqual(counts, {"created": 1, "updated": 0, "skipped": 1, "errors": 0})
+        self.assertEqual(Product.objects.get(title="Red").price, Decimal("20.00"))
+
+    def test_missing_stock_column_keeps_stored_stock(self):
+        make_product("Red", stock=7)
+
+        counts = self.run_import([self.row("Red", price="15.0")], "--update")
+        self.assertEqual(counts["updated"], 1)
+        product = Product.objects.get(title="Red")
+        self.assertEqual(product.stock, 7)
+        self.assertEqual(product.price, Decimal("15.00"))
+
+    def test_stock_column_is_imported(self):
+        self.run_import([self.row("Red") + ["3"]], header=HEADER + ["stock"])
+        self.assertEqual(Product.objects.get(title="Red").stock, 3)
+
+    def test_slug_collisions_within_batch(self):
+        self.run_import([self.row("Foo Bar", "A"), self.row("foo-bar", "B"), self.row("FOO bar", "C")])
+        self.assertEqual(
+            sorted(Product.objects.values_list("slug", flat=True)),
+            ["foo-bar", "foo-bar-2", "foo-bar-3"],
+        )
+
+    def test_slug_collisions_with_stored_products(self):
+        # "Cuvee 2" stores cuvee-2 although cuvee itself is still free
+        make_product("Cuvee 2", "X")
+
+        counts = self.run_import([self.row("Cuvee", "A"), self.row("Cuvee", "B")])
+        self.assertEqual(counts["created"], 2)
+        self.assertEqual(
+            sorted(Product.objects.filter(title="Cuvee").values_list("slug", flat=True)),
+            ["cuvee", "cuvee-3"],
+        )
+
+
+class RatingTotalsTests(TestCase):
+    def setUp(self):
+        self.product = make_product("Red")
+        self.other = make_product("White")
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+
+    def assertTotals(self, product, ratings, ratings_sum, ratings_count):
+        product.refresh_from_db()
+        self.assertEqual(
+            (product.ratings, product.ratings_sum, product.ratings_count),
+            (ratings, ratings_sum, ratings_count),
+        )
+
+    def test_create_and_edit(self):
+        rating = Rating.objects.create(user=self.alice, product=self.product, stars=4)
+        Rating.objects.create(user=self.bob, product=self.product, stars=1)
+        self.assertTotals(self.product, 2.5, 5, 2)
+
+        rating.stars = 5
+        rating.save()
+        self.assertTotals(self.product, 3.0, 6, 2)
+
+    def test_delete(self):
+        rating = Rating.objects.create(user=self.alice, product=self.product, stars=4)
+        other = Rating.objects.create(user=self.bob, product=self.product, stars=5)
+
+        other.delete()
+        self.assertTotals(self.product, 4.0, 4, 1)
+        # Removing the last rating resets the average instead of dividing by zero
+        rating.delete()
+        self.assertTotals(self.product, 0.0, 0, 0)
+
+    def test_move_to_other_product(self):
+        rating = Rating.objects.create(user=self.alice, product=self.product, stars=2)
+
+        rating.product = self.other
+        rating.stars = 3
+        rating.save()
+        self.assertTotals(self.product, 0.0, 0, 0)
+        self.assertTotals(self.other, 3.0, 3, 1)
+
+        # Totals stay consistent, so the cascade from deleting the product does not underflow
+        self.other.delete()
+        self.assertFalse(Rating.objects.exists())
+
+    def test_user_delete_cascades_into_totals(self):
+        Rating.objects.create(user=self.alice, product=self.product, stars=4)
+        Rating.objects.create(user=self.bob, product=self.product, stars=2)
+
+        self.alice.delete()
+        self.assertTotals(self.product, 2.0, 2, 1)
+
+    def test_product_delete_skips_totals_updates(self):
+        Rating.objects.create(user=self.alice, product=self.product, stars=4)
+        Rating.objects.create(user=self.bob, product=self.product, stars=2)
+
+        # Select ratings, delete ratings, delete product; no per-rating UPDATE of the product
+        product = Product.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(3):
+            product.delete()
+        self.assertFalse(Rating.objects.exists())
@@ -1,29 +1,36 @@
 from django.shortcuts import render, get_object_or_404
-from .models import Product, Rating
+from .models import Product
 from django.core.paginator import Paginator
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_headers
 
 # Create your views here.
+# The HTMX "load more" partial and the full page share a URL, so cache them separately
+@cache_page(60, cache="pages")
+@vary_on_headers("HX-Request")
 def home_view(request):
     products = Product.objects.all().order_by("-id")
     paginator = Paginator(products, 20)
     page_number = int(request.GET.get("page", 1))
     page_obj = paginator.get_page(page_number)
-    ratings = Rating.objects.all()
-    print("Products on page:", page_obj.object_list.count())
 
     context = {
         "page_obj": page_obj,
-        "ratings": ratings
     }
     if request.headers.get("HX-Request") == "true":
         return render(request, "products/partials/products.html", context)
     return render(request, 'home.html', context)
 
 def product_detail_view(request, id):
-    product = get_object_or_404(Product, id=id)
-    rating = Rating.objects.filter(product=product).first()
+    # The average and count are stored on Product (product.ratings, product.ratings_count)
+    product = get_object_or_404(
+        Product.objects.only(
+            "id", "title", "description", "price", "image_url", "ratings", "ratings_count",
+            "winery", "country_of_origin", "variety", "province", "stock", "slug",
+        ),
+        id=id,
+    )
     context = {
         "product": product,
-        "rating": rating
     }
     return render(request, 'products/product_details.html', context)
\ No newline at end of file